@@ -1,85 +1,177 @@
+import atexit
 import csv
+import functools
 import os
-from fetch_transcripts import process_url
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fetch_transcripts import close_youtube_dls, extract_video_id, process_url
 from transcript_to_blog import BlogPostGenerator
 
+MAX_WORKERS = 8
+CHECKPOINT_EVERY = 25  # Flush the CSV every N processed URLs
+PROCESSED_VALUES = {"True", "true", "TRUE"}
+_csv_lock = threading.Lock()
+
 def ensure_directories():
     """Ensure required directories exist."""
     os.makedirs("data/transcripts", exist_ok=True)
     os.makedirs("data/blogs", exist_ok=True)
 
-def read_unprocessed_urls(input_csv):
-    """Read unprocessed URLs from the CSV file."""
-    unprocessed_urls = []
-    with open(input_csv, "r", newline="", encoding="utf-8") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row["processed"].lower() != "true":
-                unprocessed_urls.append(row["url"])
-    return unprocessed_urls
-
-def mark_url_as_processed(input_csv, url):
-    """Mark a URL as processed in the CSV file."""
-    rows = []
-    with open(input_csv, "r", newline="", encoding="utf-8") as csvfile:
-        reader = csv.DictReader(csvfile)
-        rows = list(reader)
+class UrlStatus:
+    """Rows of the URL CSV in file order, indexed by URL.
+
+    Only the processed flags are changed, so saving writes every row back as
+    it was read, including duplicate URLs and any extra columns.
+    """
 
-    with open(input_csv, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=["url", "processed"])
-        writer.writeheader()
+    def __init__(self, header, rows):
+        self.header = header
+        self.rows = rows
+        self.url_col = header.index("url")
+        self.processed_col = header.index("processed")
+        self.rows_by_url = {}
         for row in rows:
-            if row["url"] == url:
-                row["processed"] = "True"
-            writer.writerow(row)
+            if len(row) > self.url_col:
+                self.rows_by_url.setdefault(row[self.url_col], []).append(row)
+
+    def is_processed(self, row):
+        return len(row) > self.processed_col and row[self.processed_col] in PROCESSED_VALUES
+
+def load_url_status(input_csv):
+    """Load the CSV file once, keeping its rows and indexing them by URL."""
+    with open(input_csv, "r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return UrlStatus(["url", "processed"], [])
+        return UrlStatus(header, list(reader))
+
+def read_unprocessed_urls(status):
+    """Return each URL with a row not yet marked as processed, once."""
+    return [
+        url for url, rows in status.rows_by_url.items()
+        if not all(status.is_processed(row) for row in rows)
+    ]
+
+def mark_url_as_processed(status, url):
+    """Mark every row for a URL as processed in memory; persisted by save_url_status."""
+    with _csv_lock:
+        for row in status.rows_by_url.get(url, []):
+            if len(row) <= status.processed_col:
+                row.extend([""] * (status.processed_col + 1 - len(row)))
+            row[status.processed_col] = "True"
+
+def save_url_status(input_csv, status):
+    """Write the CSV rows back to the file in a single pass."""
+    with _csv_lock:
+        with open(input_csv, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(status.header)
+            writer.writerows(status.rows)
 
 def fetch_transcript(url):
     """Fetch transcript for a YouTube URL."""
     print(f"Fetching transcript for: {url}")
-    video_title = process_url(url, "en")  # Assuming 'en' for English language
-    transcript_path = os.path.join("data/transcripts", f"{video_title}.txt")
+    transcript_path = process_url(url, "en")  # Assuming 'en' for English language
+    if not transcript_path:
+        raise RuntimeError("no transcript could be fetched")
     print(f"transcript_path : {transcript_path}")
     return transcript_path
 
-def generate_blog(transcript_path):
-    """Generate blog post from a transcript."""
-    print(f"Generating blog for transcript: {transcript_path}")
-    config_path = "config.json"
-    output_path = transcript_path.replace("transcripts", "blogs").replace(".txt", ".md")
-
-    generator = BlogPostGenerator(config_path)
-    transcript = generator.read_transcript(transcript_path)
-    blog_post = generator.generate_blog_post(transcript)
-    generator.save_blog_post(blog_post, output_path)
-
-    print(f"Blog post saved to: {output_path}")
-    return output_path
+@functools.lru_cache(maxsize=1)
+def _get_generator(config_path="config.json"):
+    """Return a shared BlogPostGenerator so the config is parsed once."""
+    return BlogPostGenerator(config_path)
+
+def generate_blogs(transcript_paths, on_done=None):
+    """Generate blog posts for several transcripts in a single batch.
+
+    Returns the output path for each transcript, or the exception raised
+    while generating it. on_done(index, result) is called as each one
+    finishes.
+    """
+    print(f"Generating blogs for {len(transcript_paths)} transcript(s)")
+    generator = _get_generator()
+    output_paths = [
+        path.replace("transcripts", "blogs").replace(".txt", ".md") for path in transcript_paths
+    ]
+    return generator.generate_blog_posts_from_files(
+        transcript_paths, output_paths, MAX_WORKERS, on_done
+    )
 
 def main():
     input_csv = "input_url.csv"
     ensure_directories()
 
     # Read unprocessed URLs
-    unprocessed_urls = read_unprocessed_urls(input_csv)
+    status = load_url_status(input_csv)
+    unprocessed_urls = read_unprocessed_urls(status)
 
     if not unprocessed_urls:
         print("No unprocessed URLs found. Exiting.")
         return
 
-    # Process each URL
-    for url in unprocessed_urls:
-        try:
-            # Fetch transcript
-            transcript_path = fetch_transcript(url)
-
-            # Generate blog
-            generate_blog(transcript_path)
+    # Flush the status back to disk on exit, even if interrupted
+    atexit.register(save_url_status, input_csv, status)
+    processed_count = 0
 
-            # Mark as processed
-            mark_url_as_processed(input_csv, url)
+    # Fetch each video once; other URLs for the same video (e.g. a youtu.be
+    # link next to a watch link) share its files and are marked with it
+    urls_to_fetch = []
+    duplicate_urls = {}
+    first_url_for_video = {}
+    for url in unprocessed_urls:
+        video_id = extract_video_id(url)
+        if video_id in first_url_for_video:
+            first_url = first_url_for_video[video_id]
+            print(f"Skipping URL {url}: same video as {first_url}")
+            duplicate_urls.setdefault(first_url, []).append(url)
+            continue
+        if video_id is not None:
+            first_url_for_video[video_id] = url
+        urls_to_fetch.append(url)
+
+    # Fetch transcripts concurrently; the work is network-bound (yt-dlp)
+    transcript_paths = {}
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {executor.submit(fetch_transcript, url): url for url in urls_to_fetch}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    transcript_paths[url] = future.result()
+                except Exception as e:
+                    print(f"Error processing URL {url}: {e}")
+    finally:
+        # The pool's threads are gone; close their YoutubeDL instances
+        close_youtube_dls()
+
+    if not transcript_paths:
+        return
 
-        except Exception as e:
-            print(f"Error processing URL {url}: {e}")
+    urls = list(transcript_paths)
+
+    def on_blog_done(index, result):
+        nonlocal processed_count
+        url = urls[index]
+        if isinstance(result, Exception):
+            print(f"Error processing URL {url}: {result}")
+            return
+        print(f"Blog post saved to: {result}")
+
+        # Mark as processed as soon as its blog is written, along with any
+        # duplicate URLs for the same video
+        for done_url in [url] + duplicate_urls.get(url, []):
+            mark_url_as_processed(status, done_url)
+        processed_count += 1
+        if processed_count % CHECKPOINT_EVERY == 0:
+            save_url_status(input_csv, status)
+
+    # Generate all blog posts in one batch of concurrent OpenAI requests
+    try:
+        generate_blogs(list(transcript_paths.values()), on_blog_done)
+    except Exception as e:
+        print(f"Error generating blogs: {e}")
 
 if __name__ == "__main__":
     main()
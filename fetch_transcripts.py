@@ -9,46 +9,47 @@ Transcripts are saved in the 'output' directory with filenames derived from vide
 Date: 2024-04-27
 """
 
+import io
 import os
 import sys
 import re
+import threading
 import argparse
 import logging
-from typing import List, Optional, Tuple
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 from yt_dlp import YoutubeDL
 from yt_dlp.utils import DownloadError
 
-try:
-    import webvtt
-except ImportError:
-    print("The 'webvtt-py' library is required to run this script.")
-    print("You can install it using pip:")
-    print("    pip install webvtt-py")
-    sys.exit(1)
-
 # Configuration Constants
 CONFIG = {
     'DEFAULT_LANGUAGE': 'en',  # Default transcript language
     'INPUT_FILE': 'input_url.txt',
     'OUTPUT_DIR': 'data/transcripts',
-    'SUBTITLES_DIR': 'temp_subtitles',  # Temporary directory for subtitles
     'LOG_FORMAT': '%(asctime)s - %(levelname)s - %(message)s',
     'YTDLP_OPTIONS': {
         'skip_download': True,
-        'writesubtitles': True,
-        'writeautomaticsub': True,
-        'subtitleslangs': ['en'],
-        'subtitlesformat': 'vtt',  # You can choose 'srt' if preferred
-        'outtmpl': '%(title)s.%(ext)s',
         'quiet': True,
         'no_warnings': True,
     }
 }
 
+# Matches inline VTT tags such as <c> and <00:00:01.000>
+_TAG_RE = re.compile(r'<[^>]+>')
+# Matches a YouTube video id
+_VIDEO_ID_RE = re.compile(r'[\w-]{11}')
+# Matches runs of characters that are not allowed in transcript filenames
+_INVALID_FILENAME_RE = re.compile(r'[^\w\-]+')
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format=CONFIG['LOG_FORMAT'])
 logger = logging.getLogger(__name__)
 
+# YoutubeDL instances keyed by thread id, see get_youtube_dl
+_youtube_dls: Dict[int, YoutubeDL] = {}
+_youtube_dls_lock = threading.Lock()
+
 def parse_arguments() -> List[str]:
     """
     Parses command-line arguments to extract YouTube URLs.
@@ -74,18 +75,44 @@ def read_urls_from_file(file_path: str) -> List[str]:
     """
     urls = []
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                url = line.strip()
-                if url:
-                    urls.append(url)
-        logger.info(f"Read {len(urls)} URL(s) from '{file_path}'.")
+        lines = Path(file_path).read_text(encoding='utf-8').splitlines()
+        urls = [url for url in map(str.strip, lines) if url]
+        logger.info("Read %d URL(s) from '%s'.", len(urls), file_path)
     except FileNotFoundError:
-        logger.error(f"Input file '{file_path}' not found.")
+        logger.error("Input file '%s' not found.", file_path)
     except Exception as e:
-        logger.error(f"Error reading '{file_path}': {e}")
+        logger.error("Error reading '%s': %s", file_path, e)
     return urls
 
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Extracts the video id from a YouTube URL without any network access.
+
+    Args:
+        url (str): The URL to parse.
+
+    Returns:
+        Optional[str]: The 11-character video id if the URL is a valid YouTube URL, otherwise None.
+    """
+    try:
+        parsed = urlparse(url)
+        if not parsed.scheme or not parsed.netloc:
+            # Schemeless input such as 'youtube.com/watch?v=...'
+            parsed = urlparse(f"https://{url}")
+        host = (parsed.hostname or '').lower()
+    except ValueError:
+        # Malformed URLs, e.g. an unbalanced IPv6 bracket
+        return None
+    if parsed.scheme not in ('http', 'https'):
+        return None
+    if host in ('youtu.be', 'www.youtu.be'):
+        video_id = parsed.path[1:]
+    elif host in ('youtube.com', 'www.youtube.com', 'm.youtube.com') and parsed.path == '/watch':
+        video_id = parse_qs(parsed.query).get('v', [''])[0]
+    else:
+        return None
+    return video_id if _VIDEO_ID_RE.fullmatch(video_id) else None
+
 def is_valid_youtube_url(url: str) -> bool:
     """
     Validates whether a given URL is a valid YouTube URL.
@@ -96,12 +123,7 @@ def is_valid_youtube_url(url: str) -> bool:
     Returns:
         bool: True if valid YouTube URL, False otherwise.
     """
-    youtube_regex = re.compile(
-        r'^(https?://)?(www\.)?'
-        r'(youtube\.com/watch\?v=|youtu\.be/)'
-        r'[\w-]{11}(&\S*)?$'
-    )
-    return bool(youtube_regex.match(url))
+    return extract_video_id(url) is not None
 
 def sanitize_filename(title: str) -> str:
     """
@@ -114,182 +136,250 @@ def sanitize_filename(title: str) -> str:
         str: A sanitized filename with spaces replaced by dashes and special characters removed.
     """
     # Replace spaces with dashes
-    filename = title.replace(' ', '-')
-    # Remove characters that are invalid in filenames
-    filename = re.sub(r'[\\/*?:"<>|]', '', filename)
-    return filename
+    filename = title.strip().replace(' ', '-')
+    # Keep only word characters and dashes
+    return _INVALID_FILENAME_RE.sub('', filename)
+
+def get_youtube_dl() -> YoutubeDL:
+    """
+    Returns the YoutubeDL instance for the current thread, creating it on first use.
+
+    Reusing one instance across URLs skips repeated extractor setup and keeps yt-dlp's
+    caches warm. YoutubeDL is not thread-safe, so each worker thread gets its own.
+    Call close_youtube_dls once the worker threads are done.
+
+    Returns:
+        YoutubeDL: The shared instance for this thread.
+    """
+    thread_id = threading.get_ident()
+    with _youtube_dls_lock:
+        ydl = _youtube_dls.get(thread_id)
+        if ydl is None:
+            ydl = YoutubeDL(CONFIG['YTDLP_OPTIONS'])
+            _youtube_dls[thread_id] = ydl
+    return ydl
+
+def close_youtube_dls() -> None:
+    """
+    Closes every YoutubeDL instance created by get_youtube_dl, saving cookies and
+    shutting down their network sessions.
+    """
+    with _youtube_dls_lock:
+        ydls = list(_youtube_dls.values())
+        _youtube_dls.clear()
+    for ydl in ydls:
+        try:
+            ydl.close()
+        except Exception as e:
+            logger.warning("Could not close YoutubeDL instance: %s", e)
 
-def fetch_transcript(url: str, language: str = CONFIG['DEFAULT_LANGUAGE']) -> Optional[Tuple[str, str]]:
+def fetch_subtitles(url: str, language: str = CONFIG['DEFAULT_LANGUAGE'],
+                    ydl: Optional[YoutubeDL] = None) -> Optional[Tuple[str, str, str]]:
     """
-    Fetches the transcript for a given YouTube URL, prioritizing user-provided subtitles over auto-generated ones.
+    Fetches the VTT subtitles for a given YouTube URL into memory, prioritizing user-provided subtitles over auto-generated ones.
     
     Args:
         url (str): The YouTube video URL.
         language (str): The language code for the transcript.
+        ydl (Optional[YoutubeDL]): The instance to use; defaults to this thread's shared one.
     
     Returns:
-        Optional[Tuple[str, str]]: A tuple containing the transcript text and video title if available, otherwise None.
+        Optional[Tuple[str, str, str]]: A tuple containing the VTT text, video title and subtitle type
+        ('user-provided' or 'auto-generated') if available, otherwise None.
     """
+    if ydl is None:
+        ydl = get_youtube_dl()
+
     # Step 1: Extract video information without downloading subtitles
-    initial_ydl_opts = {
-        'skip_download': True,
-        'quiet': True,
-        'no_warnings': True,
-    }
-    
-    with YoutubeDL(initial_ydl_opts) as ydl:
-        try:
-            info = ydl.extract_info(url, download=False)
-            video_title = info.get('title', 'video').strip().replace(' ', '-')
-            video_title = re.sub(r'[^a-zA-Z0-9\-]', '', video_title)
-            max_length = 50
-            video_title = video_title[:max_length]
-            subtitles = info.get('subtitles', {})
-            automatic_captions = info.get('automatic_captions', {})
-        except DownloadError as de:
-            logger.error(f"Failed to extract video info: {de}")
-            return None
-        except Exception as e:
-            logger.error(f"An unexpected error occurred during info extraction: {e}")
-            return None
+    try:
+        info = ydl.extract_info(url, download=False)
+        # Sanitize once; the result is reused for every derived file name. The video id
+        # keeps names unique when titles collide or sanitize to '' (punctuation only)
+        safe_title = sanitize_filename(info.get('title', 'video'))[:50]
+        video_title = f"{safe_title}-{info['id']}" if safe_title else info['id']
+        subtitles = info.get('subtitles') or {}
+        automatic_captions = info.get('automatic_captions') or {}
+    except DownloadError as de:
+        logger.error("Failed to extract video info: %s", de)
+        return None
+    except Exception as e:
+        logger.error("An unexpected error occurred during info extraction: %s", e)
+        return None
     
     # Step 2: Determine subtitle availability
     if language in subtitles:
         subtitle_type = 'user-provided'
-        download_subtitles = True
-        write_automaticsub = False
+        subtitle_formats = subtitles[language]
     elif language in automatic_captions:
         subtitle_type = 'auto-generated'
-        download_subtitles = True
-        write_automaticsub = True
+        subtitle_formats = automatic_captions[language]
     else:
-        logger.warning(f"No '{language}' subtitles available for '{video_title}'.")
+        logger.warning("No '%s' subtitles available for '%s'.", language, video_title)
         return None
     
-    # Step 3: Configure yt-dlp options based on subtitle type
-    ydl_opts = {
-        'skip_download': True,
-        'writesubtitles': download_subtitles,
-        'writeautomaticsub': write_automaticsub,
-        'subtitleslangs': [language],
-        'subtitlesformat': 'vtt',  # Change to 'srt' if preferred
-        'outtmpl': os.path.join(CONFIG['SUBTITLES_DIR'], f"{sanitize_filename(video_title)}.%(ext)s"),
-        'quiet': True,
-        'no_warnings': True,    
-    }
-    
-    # Ensure the subtitles directory exists
-    if not os.path.exists(CONFIG['SUBTITLES_DIR']):
-        os.makedirs(CONFIG['SUBTITLES_DIR'])
-        logger.debug(f"Created subtitles directory '{CONFIG['SUBTITLES_DIR']}'.")
-    
-    # Step 4: Download the appropriate subtitles
-    with YoutubeDL(ydl_opts) as ydl:
-        try:
-            ydl.extract_info(url, download=True)
-        except DownloadError as de:
-            logger.error(f"Failed to download {subtitle_type} subtitles: {de}")
-            return None
-        except Exception as e:
-            logger.error(f"An unexpected error occurred during subtitle download: {e}")
-            return None
-    
-    # Step 5: Construct the expected subtitle file path
-    subtitle_filename = f"{video_title}.{language}.vtt"
-    subtitle_path = os.path.join(CONFIG['SUBTITLES_DIR'], subtitle_filename)
-    
-    if not os.path.exists(subtitle_path):
-        logger.warning(f"Subtitle file '{subtitle_filename}' not found.")
+    vtt_format = next((f for f in subtitle_formats if f.get('ext') == 'vtt'), None)
+    if not vtt_format:
+        logger.warning("No VTT %s subtitles available for '%s'.", subtitle_type, video_title)
         return None
     
-    # Step 6: Read and convert the subtitle file to plain text
-    transcript_text = convert_subtitles_to_text(subtitle_path)
-    
-    # Step 7: Clean up the subtitle file after processing
+    # Step 3: Fetch the subtitles straight into memory over yt-dlp's session
     try:
-        os.remove(subtitle_path)
-        logger.debug(f"Removed temporary subtitle file '{subtitle_filename}'.")
+        with ydl.urlopen(vtt_format['url']) as response:
+            vtt_text = response.read().decode('utf-8')
     except Exception as e:
-        logger.warning(f"Could not remove subtitle file '{subtitle_filename}': {e}")
+        logger.error("Failed to download %s subtitles: %s", subtitle_type, e)
+        return None
+
+    logger.info("Fetched %s subtitles for '%s'.", subtitle_type, video_title)
+    return vtt_text, video_title, subtitle_type
+
+def fetch_transcript_text(url: str, language: str = CONFIG['DEFAULT_LANGUAGE']) -> Optional[Tuple[str, str]]:
+    """
+    Fetches the transcript text for a given YouTube URL without writing anything to disk,
+    prioritizing user-provided subtitles over auto-generated ones.
+    
+    Args:
+        url (str): The YouTube video URL.
+        language (str): The language code for the transcript.
     
-    logger.info(f"Fetched {subtitle_type} transcript for '{video_title}'.")
+    Returns:
+        Optional[Tuple[str, str]]: A tuple containing the transcript text and video title if available, otherwise None.
+    """
+    # One-off fetch, so use a short-lived instance that is closed right away
+    with YoutubeDL(CONFIG['YTDLP_OPTIONS']) as ydl:
+        result = fetch_subtitles(url, language, ydl)
+    if not result:
+        return None
+
+    vtt_text, video_title, subtitle_type = result
+    auto_generated = subtitle_type == 'auto-generated'
+    transcript_text = '\n'.join(convert_subtitles_to_text(vtt_text, auto_generated))
     return transcript_text, video_title
 
-def convert_subtitles_to_text(subtitle_path: str) -> str:
+def iter_captions(lines: Iterable[str]) -> Iterator[str]:
     """
-    Converts a subtitle file (VTT) to plain text without consecutive duplicate lines.
+    Parses WebVTT lines and yields the text of each cue as it is read.
+
+    Cues start at a timing line (containing '-->') and end at the next empty line;
+    the header, cue identifiers, NOTE and STYLE blocks are skipped.
 
     Args:
-        subtitle_path (str): Path to the subtitle file.
+        lines (Iterable[str]): Lines of a WebVTT document.
 
-    Returns:
-        str: The clean plain text transcript.
+    Yields:
+        str: The text of each cue, with multiple lines joined by newlines.
     """
-    try:
-        captions = webvtt.read(subtitle_path)
-    except Exception as e:
-        logger.error(f"Error reading subtitle file '{subtitle_path}': {e}")
-        return ""
+    cue_lines = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if '-->' in line:
+            cue_lines = []
+        elif not line:
+            if cue_lines is not None:
+                yield '\n'.join(cue_lines)
+            cue_lines = None
+        elif cue_lines is not None:
+            cue_lines.append(line)
+    if cue_lines is not None:
+        yield '\n'.join(cue_lines)
+
+def convert_subtitles_to_text(vtt_text: str, auto_generated: bool = False) -> Iterator[str]:
+    """
+    Converts VTT subtitles to plain text lines, streaming them caption by caption.
 
-    transcript = []
-    previous_line = ""
+    Auto-generated captions repeat the previous line as a rolling window, so for those
+    a line equal to, or a suffix of, the previous line is skipped. User-provided
+    subtitles keep every non-empty line.
 
-    for idx,caption in enumerate(captions):
-        # Clean the caption text by stripping HTML tags and unnecessary whitespace
-        clean_text = re.sub(r'<[^>]+>', '', caption.text).strip()
-        if clean_text and idx % 2 == 0:
-            transcript.append(clean_text)
-    
-    return '\n'.join(transcript)
+    Args:
+        vtt_text (str): The VTT subtitle document.
+        auto_generated (bool): Whether the subtitles are YouTube auto-generated captions.
 
-def save_transcript(transcript: str, video_title: str) -> None:
+    Yields:
+        str: Each clean line of the transcript.
     """
-    Saves the transcript to a text file within the output directory.
+    previous_line = ""
+    for caption in iter_captions(io.StringIO(vtt_text)):
+        # Clean the caption text by stripping HTML tags and unnecessary whitespace
+        clean_text = _TAG_RE.sub('', caption) if '<' in caption else caption
+        for line in clean_text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            if auto_generated and (line == previous_line or previous_line.endswith(line)):
+                continue
+            yield line
+            previous_line = line
+
+def stream_vtt_to_file(vtt_text: str, output_path: str, auto_generated: bool = False) -> int:
+    """
+    Converts VTT subtitles to a plain text transcript file, writing each kept caption
+    as it is read.
 
     Args:
-        transcript (str): The transcript text.
-        video_title (str): The title of the YouTube video.
+        vtt_text (str): The VTT subtitle document.
+        output_path (str): Path of the transcript file to write.
+        auto_generated (bool): Whether the subtitles are YouTube auto-generated captions.
+
+    Returns:
+        int: The number of lines written, or 0 if the transcript was empty or could not
+        be written; no file is left behind in that case.
     """
+    line_count = 0
     try:
-        if not os.path.exists(CONFIG['OUTPUT_DIR']):
-            os.makedirs(CONFIG['OUTPUT_DIR'])
-            logger.debug(f"Created output directory '{CONFIG['OUTPUT_DIR']}'.")
-
-        filename = sanitize_filename(video_title)[:50]  # Limit filename length
-        output_path = os.path.join(CONFIG['OUTPUT_DIR'], f"{filename}.txt")
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(transcript)
-        logger.info(f"Transcript saved to '{output_path}'.")
+        with open(output_path, 'w', encoding='utf-8') as out:
+            for line in convert_subtitles_to_text(vtt_text, auto_generated):
+                out.write(line + '\n')
+                line_count += 1
     except Exception as e:
-        logger.error(f"Failed to save transcript for '{video_title}': {e}")
+        logger.error("Failed to save transcript to '%s': %s", output_path, e)
+        line_count = 0
+
+    if not line_count:
+        # Never leave an empty or truncated transcript behind
+        try:
+            os.remove(output_path)
+        except FileNotFoundError:
+            pass
+        return 0
 
-def process_url(url: str, language: str) -> None:
+    logger.info("Transcript saved to '%s'.", output_path)
+    return line_count
+
+def process_url(url: str, language: str) -> Optional[str]:
     """
     Processes a single YouTube URL to fetch and save its transcript.
 
     Args:
         url (str): The YouTube video URL.
         language (str): The language code for the transcript.
+
+    Returns:
+        Optional[str]: The path of the saved transcript, otherwise None.
     """
-    logger.info(f"Processing URL: {url}")
+    logger.info("Processing URL: %s", url)
 
     if not is_valid_youtube_url(url):
-        logger.error(f"Invalid YouTube URL: {url}")
-        return
-
-    result = fetch_transcript(url, language)
-    if result:
-        transcript, video_title = result
-        if transcript:
-            save_transcript(transcript, video_title)
-            return video_title
-        else:
-            return None
-            logger.warning(f"No transcript available for '{url}'.")
-    else:
-        logger.warning(f"Could not retrieve transcript for '{url}'.")
+        logger.error("Invalid YouTube URL: %s", url)
+        return None
+
+    result = fetch_subtitles(url, language)
+    if not result:
+        logger.warning("Could not retrieve transcript for '%s'.", url)
         return None
 
+    vtt_text, video_title, subtitle_type = result
+    if not os.path.exists(CONFIG['OUTPUT_DIR']):
+        os.makedirs(CONFIG['OUTPUT_DIR'], exist_ok=True)
+        logger.debug("Created output directory '%s'.", CONFIG['OUTPUT_DIR'])
+
+    output_path = os.path.join(CONFIG['OUTPUT_DIR'], f"{video_title}.txt")
+    auto_generated = subtitle_type == 'auto-generated'
+    if not stream_vtt_to_file(vtt_text, output_path, auto_generated):
+        logger.warning("No transcript available for '%s'.", url)
+        return None
+    return output_path
+
 def main():
     """
     The main entry point of the script.
@@ -307,16 +397,11 @@ def main():
         sys.exit(1)
 
     # Process each URL
-    for url in urls:
-        process_url(url, CONFIG['DEFAULT_LANGUAGE'])
-
-    # Clean up subtitles directory if empty
     try:
-        if os.path.exists(CONFIG['SUBTITLES_DIR']) and not os.listdir(CONFIG['SUBTITLES_DIR']):
-            os.rmdir(CONFIG['SUBTITLES_DIR'])
-            logger.debug(f"Removed empty subtitles directory '{CONFIG['SUBTITLES_DIR']}'.")
-    except Exception as e:
-        logger.warning(f"Could not remove subtitles directory: {e}")
+        for url in urls:
+            process_url(url, CONFIG['DEFAULT_LANGUAGE'])
+    finally:
+        close_youtube_dls()
 
     logger.info("Transcript fetching completed.")
 
@@ -1,5 +1,5 @@
 import streamlit as st
-from fetch_transcripts import process_url, fetch_transcript
+from fetch_transcripts import fetch_transcript_text
 from transcript_to_blog import BlogPostGenerator
 import os 
 
@@ -30,9 +30,7 @@ def fetch_transcript_ui(url):
     """Fetch transcript and store it in session state."""
     st.info(f"Fetching transcript for: {url}")
     try:
-        # video_title = process_url(url, "en")  # Assuming 'en' for English language
-
-        result = fetch_transcript(url, 'en')
+        result = fetch_transcript_text(url, 'en')
         if result:
             transcript, video_title = result
             st.session_state.transcript_text = f"{transcript}"  # Mocked text for testing
@@ -48,7 +46,11 @@ def generate_blog_ui(transcript_text):
     try:
         config_path = "config.json"
         generator = BlogPostGenerator(config_path)
-        blog_post = generator.generate_blog_post(transcript_text)
+        # Show the post as it streams in; the preview below replaces it
+        placeholder = st.empty()
+        with placeholder.container():
+            blog_post = st.write_stream(generator.stream_blog_post(transcript_text))
+        placeholder.empty()
         st.session_state.blog_post = blog_post
         st.success("Blog post generated successfully!")
     except Exception as e:
@@ -1,27 +1,44 @@
 import openai
+import asyncio
 import json
 import os
-from openai import OpenAI
+from pathlib import Path
+from openai import AsyncOpenAI, OpenAI
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MAX_CONCURRENT_REQUESTS = 8
 
 class BlogPostGenerator:
     def __init__(self, config_path="config.json"):
         self.load_config(config_path)
+        self._client = None
+
+    @property
+    def client(self):
+        # Created on first use so the async-only batch path never builds it
+        if self._client is None:
+            self._client = OpenAI()
+        return self._client
 
     def load_config(self, config_path):
-        with open(config_path, "r") as config_file:
-            self.config = json.load(config_file)
+        config_bytes = Path(config_path).read_bytes()
+        self.config = orjson.loads(config_bytes) if orjson else json.loads(config_bytes)
+        # Split the prompt template once so each request is two concatenations
+        pre, _, post = self.config["system_prompt"].partition("{{transcript}}")
+        self._prompt_pre, self._prompt_post = pre, post
 
     def read_transcript(self, transcript_path):
-        with open(transcript_path, "r") as transcript_file:
-            return transcript_file.read()
+        return Path(transcript_path).read_bytes().decode("utf-8")
 
-    def generate_blog_post(self, transcript):
-        prompt = self.config["system_prompt"].replace("{{transcript}}", transcript)
-        client = OpenAI()
-
-        response = client.chat.completions.create(
-            model="o1-preview",
-            messages=[
+    def build_request(self, transcript):
+        prompt = self._prompt_pre + transcript + self._prompt_post
+        return {
+            "model": "o1-preview",
+            "messages": [
                 {
                     "role": "user",
                     "content": [
@@ -32,13 +49,107 @@ class BlogPostGenerator:
                     ],
                 }
             ],
-        )
+        }
+
+    @staticmethod
+    def delta_text(chunk):
+        return (chunk.choices[0].delta.content or "") if chunk.choices else ""
+
+    @staticmethod
+    def partial_path(output_path):
+        # Posts stream into this file and only replace output_path once complete,
+        # so a failed request never leaves a truncated post behind
+        return output_path + ".part"
+
+    @staticmethod
+    def discard_partial(partial_path):
+        try:
+            os.remove(partial_path)
+        except FileNotFoundError:
+            pass
+
+    def stream_blog_post(self, transcript):
+        stream = self.client.chat.completions.create(**self.build_request(transcript), stream=True)
+        for chunk in stream:
+            yield self.delta_text(chunk)
+
+    def generate_blog_post(self, transcript, output_path=None):
+        """Generate a blog post from a transcript.
 
-        return response.choices[0].message.content
+        With output_path, the post is written to that file as it streams in
+        and the path is returned; otherwise the full text is returned.
+        """
+        if output_path is None:
+            return "".join(self.stream_blog_post(transcript))
 
-    def save_blog_post(self, content, output_path):
-        with open(output_path, "w") as output_file:
-            output_file.write(content)
+        partial_path = self.partial_path(output_path)
+        try:
+            with open(partial_path, "w", encoding="utf-8", newline="\n") as output_file:
+                for text in self.stream_blog_post(transcript):
+                    output_file.write(text)
+        except BaseException:
+            self.discard_partial(partial_path)
+            raise
+        os.replace(partial_path, output_path)
+        return output_path
+
+    def generate_blog_posts_from_files(self, transcript_paths, output_paths=None,
+                                       max_concurrency=MAX_CONCURRENT_REQUESTS, on_done=None):
+        """Generate blog posts for several transcript files with concurrent requests.
+
+        At most max_concurrency requests are in flight, and each transcript is
+        only read once its request is about to start. With output_paths, each
+        post is streamed into its file and the path is returned, as in
+        generate_blog_post. Results are returned in input order; a failed
+        request is returned as its exception instead of aborting the whole
+        batch. on_done(index, result) is called as each post finishes, on the
+        calling thread.
+        """
+        if output_paths is None:
+            output_paths = [None] * len(transcript_paths)
+
+        async def generate(client, semaphore, transcript_path, output_path):
+            async with semaphore:
+                # Read inside the semaphore so only in-flight transcripts are in memory
+                stream = await client.chat.completions.create(
+                    **self.build_request(self.read_transcript(transcript_path)), stream=True
+                )
+                if output_path is None:
+                    return "".join([self.delta_text(chunk) async for chunk in stream])
+
+                partial_path = self.partial_path(output_path)
+                try:
+                    with open(partial_path, "w", encoding="utf-8", newline="\n") as output_file:
+                        async for chunk in stream:
+                            output_file.write(self.delta_text(chunk))
+                except BaseException:
+                    self.discard_partial(partial_path)
+                    raise
+                os.replace(partial_path, output_path)
+                return output_path
+
+        async def run(client, semaphore, index, transcript_path, output_path):
+            try:
+                result = await generate(client, semaphore, transcript_path, output_path)
+            except Exception as e:
+                result = e
+            if on_done is not None:
+                on_done(index, result)
+            return result
+
+        async def generate_all():
+            semaphore = asyncio.Semaphore(max_concurrency)
+            # One client, and so one connection pool, shared by the whole batch
+            async with AsyncOpenAI() as client:
+                return await asyncio.gather(
+                    *[
+                        run(client, semaphore, i, t, p)
+                        for i, (t, p) in enumerate(zip(transcript_paths, output_paths))
+                    ],
+                    return_exceptions=True,
+                )
+
+        return asyncio.run(generate_all())
 
 
 if __name__ == "__main__":
@@ -52,10 +163,7 @@ if __name__ == "__main__":
     # Read transcript
     transcript = generator.read_transcript(TRANSCRIPT_PATH)
 
-    # Generate blog post
-    blog_post = generator.generate_blog_post(transcript)
-
-    # Save blog post
-    generator.save_blog_post(blog_post, OUTPUT_PATH)
+    # Generate blog post, streaming it to disk
+    generator.generate_blog_post(transcript, OUTPUT_PATH)
 
     print(f"Blog post saved to {OUTPUT_PATH}.")